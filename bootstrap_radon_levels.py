@@ -10,117 +10,192 @@
 #			   Note 2: replace the TEST MODEL created in this code with the
 #					   actual array of radon values from a specific radon study.
 #					   Replace the 'rnp' numpy array with actual data.
+#			   Note 3: the samples are drawn WITH replacement (i.e. a proper
+#					   bootstrap). Drawing without replacement would instead
+#					   give sub-sampling, which is a different estimator.
+
+import os
+from multiprocessing import Pool
 
 import numpy as np
-from scipy import stats
 import matplotlib.pyplot as plt
 
+try:
+ import cupy as cp
+ # An installed CuPy is not enough, it also needs a usable CUDA device and
+ # driver (getDeviceCount raises a CUDARuntimeError without them)
+ if cp.cuda.runtime.getDeviceCount() < 1:
+  cp = None
+except (ImportError, RuntimeError):
+ # CuPy is optional, without it everything runs on the CPU
+ cp = None
 
-# Define a Lognormal distribution with a median (geometric mean)
-# close to 84.7 Bq/m3 and for which has ~17.8% of the distribution > 200 Bq/m3
-# This corresponds to a lognormal representation of the data
-# collected as part of the CCRS 2024 study:
-# reference: https://crosscanadaradon.ca/survey/
-# Quote: 'When all Canadian data (for all regions, communities, and building types) 
-#		  are combined in a manner that is balanced by distribution of these factors as 
-#		  established by the 2021 Canada Census, the geometric average household radon 
-#		  level was 84.7 Bq/m³, with just under 1 in 5 (17.8%) of single-detached, 
-#		  semi-detached, and row-type residential buildings containing radon levels 
-#		  that are at or over 200 Bq/m³.'
-########################
-### TEST MODEL BEGIN ###
-########################
-mu = 129.6
-sigma = 150.35
-
-a = 1 + (sigma / mu) ** 2
-s = np.sqrt(np.log(a))
-scale = mu / np.sqrt(a)
-
-distr = stats.lognorm(s, 0, scale)
-
-
-# generate some random values according to the model (1,000,000)
-randomvals = distr.rvs(1_000_000)
-# convert into a numpy array for ease-of-use
-rnp = np.array(randomvals)
-
-print("Target: 84.7 Bq/m3 with 17.8% above 200")
-tot_num = rnp.size
-percent_above_200 =  100.0*((rnp > 200.0).sum()/tot_num)
-# median (=Geometric mean for Lognormal distributions)
-gm_value = np.percentile(randomvals,50)
-
-print("Geometric mean of distribution: "+str(gm_value)+", % above 200 Bq/m3: "+str(percent_above_200))
-######################
-### TEST MODEL END ###
-######################
-
-# Number of random sampling iterations
-
-# For each sample size, we will randomly sample 5000 (=num_iterations) times
-num_iterations = 1000
-sample_sizes = [5, 10, 25, 50, 100, 250, 500, 750, 1000, 2000, 10000, 100000]
-# Ignore below, for testing
-#sample_sizes = [5, 100000]
-
-# For each set of sampling, we'll store the 90% lower and upper confidence bounds
-sample_gm_lower_bounds = []
-sample_gm_upper_bounds = []
-
-for s in (sample_sizes):
- print("----------------------------------------")
+
+# Size of the CPU L2 cache (per core). On the CPU the (iterations x sample size)
+# matrix of samples is built in tiles of iterations sized to fit in it, so that
+# each tile stays in cache while it is processed. Adjust to your machine.
+l2_cache_bytes = 2 * 1024**2
+
+# Sample sizes from which the resampling is done on the GPU (if CuPy is
+# available): large samples are where the GPU memory bandwidth pays off, and
+# there the samples are built in batches of up to ~10^7 values
+gpu_min_sample_size = 10000
+gpu_max_batch_values = 10**7
+
+
+def init_worker(population):
+ # Give each worker process its own reference to the parent population
+ global rnp
+ rnp = population
+
+
+def run_one(s, num_iterations, seed):
+ # Randomly sample 'num_iterations' times a sample of size 's' and return
+ # the observed geometric means. Each sample size gets its own seed so that
+ # the worker processes draw statistically independent random streams.
+ rng = np.random.default_rng(seed)
  
  # For this sample size, store the observed geometric means
- cur_sample_gm_means = []
- print("Sample size: "+str(s)+", iterations: "+str(num_iterations))
-	
- for i in range(0, num_iterations):
- 
-  # Perform a sample
-  sampled_values = np.random.choice(rnp, size=s, replace=False)
-  
-  # Compute the geometric mean of the sample
-  sample_gm_mean = np.percentile(np.array(sampled_values),50)
+ cur_sample_gm_means = np.empty(num_iterations)
+ use_gpu = cp is not None and s >= gpu_min_sample_size
+ if use_gpu:
+  # Keep the parent population and the random numbers on the GPU, only the
+  # geometric means are copied back
+  rnp_gpu = cp.asarray(rnp)
+  rng_gpu = cp.random.RandomState(int(seed.generate_state(1)[0]))
+  batch = max(1, gpu_max_batch_values // s)
+ else:
+  batch = max(1, l2_cache_bytes // (s*rnp.itemsize))
   
-  # Store it in the current array for this sample size
-  cur_sample_gm_means.append(sample_gm_mean) 	
-  
-  # Output some progress
-  if ( (i % 100) == 0):
-   print("--"+str(100.0*i/num_iterations)+ "% complete")
- 
- # Compute the 5th percentile and 95th percentile (spread = 90% CI)
- sample_gm_lower_bounds.append(np.percentile(np.array(cur_sample_gm_means),5))
- sample_gm_upper_bounds.append(np.percentile(np.array(cur_sample_gm_means),95))
+  # The samples of every batch are gathered into the same buffer
+  sample_buf = np.empty((min(batch, num_iterations), s), dtype=rnp.dtype)
  
- #Output some progress on the confidence intervals being computed
- print("Current lower bounds: "+str(sample_gm_lower_bounds))
- print("Current upper bounds: "+str(sample_gm_upper_bounds))
+ # The sampled indices are drawn as int32 rather than the default int64, which
+ # halves the size of the largest intermediate array (the population is far
+ # smaller than 2^31 values)
+ for b0 in range(0, num_iterations, batch):
+  b1 = min(b0 + batch, num_iterations)
+  
+  if use_gpu:
+   # Perform (b1 - b0) samples at once, one per row, and compute the
+   # geometric mean of each sample
+   idx = rng_gpu.randint(0, rnp.size, size=(b1 - b0, s), dtype=cp.int32)
+   cur_sample_gm_means[b0:b1] = cp.asnumpy(cp.median(rnp_gpu[idx], axis=1))
+  else:
+   # Perform (b1 - b0) samples at once, one per row
+   idx = rng.integers(0, rnp.size, size=(b1 - b0, s), dtype=np.int32)
+   samples = np.take(rnp, idx, out=sample_buf[:b1 - b0], mode='clip')
+   
+   # Compute the geometric mean of each sample. The buffer is refilled at the
+   # next batch, so let np.median partition it in place instead of copying it
+   cur_sample_gm_means[b0:b1] = np.median(samples, axis=1, overwrite_input=True)
  
-### Figure 1, the parent distribution (sanity check)
-
-plt.figure(1)
-plt.hist(rnp, bins='auto')  # arguments are passed to np.histogram
-plt.xlabel("Radon level (Bq/m3)")
-plt.ylabel("Counts")
-plt.title('')
-plt.grid()
-#plt.yscale("log")
-plt.xlim(0, 1000)
-plt.ylim(0, 20000)
-
-### Figure 2, confidence intervals
-
-plt.figure(2)
-plt.plot(sample_sizes, sample_gm_lower_bounds, '--ro', linewidth=2.0)
-plt.plot(sample_sizes, sample_gm_upper_bounds, '--bo', linewidth=2.0)
-
-plt.xlabel("Sampling number (# radon tests per region)")
-plt.ylabel("90% Confidence interval")
-plt.title('')
-plt.grid()
-plt.xscale("log")
-plt.xlim(1, 200000)
-plt.ylim(0, 220)
-plt.show()
+ return cur_sample_gm_means
+
+
+if __name__ == "__main__":
+ # Define a Lognormal distribution with a median (geometric mean)
+ # close to 84.7 Bq/m3 and for which has ~17.8% of the distribution > 200 Bq/m3
+ # This corresponds to a lognormal representation of the data
+ # collected as part of the CCRS 2024 study:
+ # reference: https://crosscanadaradon.ca/survey/
+ # Quote: 'When all Canadian data (for all regions, communities, and building types) 
+ #		  are combined in a manner that is balanced by distribution of these factors as 
+ #		  established by the 2021 Canada Census, the geometric average household radon 
+ #		  level was 84.7 Bq/m³, with just under 1 in 5 (17.8%) of single-detached, 
+ #		  semi-detached, and row-type residential buildings containing radon levels 
+ #		  that are at or over 200 Bq/m³.'
+ ########################
+ ### TEST MODEL BEGIN ###
+ ########################
+ mu = 129.6
+ sigma = 150.35
+
+ a = 1 + (sigma / mu) ** 2
+ s = np.sqrt(np.log(a))
+ scale = mu / np.sqrt(a)
+
+ # generate some random values according to the model (1,000,000),
+ # i.e. a lognormal with a median of 'scale' and a shape (sigma of the log) of 's'
+ rng = np.random.default_rng()
+ rnp = rng.lognormal(mean=np.log(scale), sigma=s, size=1_000_000)
+
+ print("Target: 84.7 Bq/m3 with 17.8% above 200")
+ tot_num = rnp.size
+ percent_above_200 =  100.0*((rnp > 200.0).sum()/tot_num)
+ # median (=Geometric mean for Lognormal distributions)
+ gm_value = np.percentile(rnp,50)
+
+ print("Geometric mean of distribution: "+str(gm_value)+", % above 200 Bq/m3: "+str(percent_above_200))
+ ######################
+ ### TEST MODEL END ###
+ ######################
+
+ # Radon levels are only measured to ~3 significant digits, so single precision
+ # is plenty and halves the memory traffic of the resampling below
+ rnp = rnp.astype(np.float32)
+
+ # Number of random sampling iterations
+
+ # For each sample size, we will randomly sample 5000 (=num_iterations) times
+ num_iterations = 1000
+ sample_sizes = [5, 10, 25, 50, 100, 250, 500, 750, 1000, 2000, 10000, 100000]
+ # Ignore below, for testing
+ #sample_sizes = [5, 100000]
+
+ # For each set of sampling, we'll store the 90% lower and upper confidence bounds
+ sample_gm_lower_bounds = []
+ sample_gm_upper_bounds = []
+
+ # Each sample size is independent, so spread them over the available cores
+ seeds = np.random.SeedSequence().spawn(len(sample_sizes))
+ num_processes = max(1, min(len(sample_sizes), (os.cpu_count() or 2) - 1))
+ with Pool(num_processes, initializer=init_worker, initargs=(rnp,)) as pool:
+  jobs = [pool.apply_async(run_one, (s, num_iterations, seed)) for s, seed in zip(sample_sizes, seeds)]
+  
+  # The workers do not print anything, output some progress as each sample size completes
+  results = []
+  for s, job in zip(sample_sizes, jobs):
+   results.append(job.get())
+   print("Sample size: "+str(s)+", iterations: "+str(num_iterations)+" -- complete")
+
+ for cur_sample_gm_means in results:
+  # Compute the 5th percentile and 95th percentile (spread = 90% CI)
+  gm_lower_bound, gm_upper_bound = np.percentile(cur_sample_gm_means, [5, 95])
+  sample_gm_lower_bounds.append(gm_lower_bound)
+  sample_gm_upper_bounds.append(gm_upper_bound)
+
+ #Output the confidence intervals computed
+ print("----------------------------------------")
+ print("Lower bounds: "+str(sample_gm_lower_bounds))
+ print("Upper bounds: "+str(sample_gm_upper_bounds))
+
+ ### Figure 1, the parent distribution (sanity check)
+
+ plt.figure(1)
+ # Fixed bins over the plotted range, rather than bins='auto' which has to
+ # work out the bin width from the whole population first
+ counts, edges = np.histogram(rnp, bins=256, range=(0, 1000))
+ plt.stairs(counts, edges, fill=True)
+ plt.xlabel("Radon level (Bq/m3)")
+ plt.ylabel("Counts")
+ plt.title('')
+ plt.grid()
+ #plt.yscale("log")
+ plt.xlim(0, 1000)
+ plt.ylim(0, 1.05*counts.max())
+
+ ### Figure 2, confidence intervals
+
+ plt.figure(2)
+ plt.plot(sample_sizes, sample_gm_lower_bounds, '--ro', linewidth=2.0)
+ plt.plot(sample_sizes, sample_gm_upper_bounds, '--bo', linewidth=2.0)
+
+ plt.xlabel("Sampling number (# radon tests per region)")
+ plt.ylabel("90% Confidence interval")
+ plt.title('')
+ plt.grid()
+ plt.xscale("log")
+ plt.xlim(1, 200000)
+ plt.ylim(0, 220)
+ plt.show()
@@ -12,250 +12,459 @@
 #			   Note 2: replace the TEST MODEL created in this code with the
 #					   actual array of radon values from a specific radon study.
 #					   Replace the 'rnp' numpy array with actual data.
+#			   Note 3: the samples are drawn WITH replacement (i.e. a proper
+#					   bootstrap). Drawing without replacement would instead
+#					   give sub-sampling, which is a different estimator.
 
 # More useful information on KS tests
 # Link 1: https://stackoverflow.com/questions/10884668/two-sample-kolmogorov-smirnov-test-in-python-scipy
 # Link 2: https://sparky.rice.edu/astr360/kstest.pdf
 # Link 3: https://blogs.sas.com/content/iml/2019/05/20/critical-values-kolmogorov-test.html
 
+import os
+from multiprocessing import Pool
+
 import numpy as np
 from scipy import stats
 import matplotlib.pyplot as plt
 
+try:
+ from numba import config as numba_config
+ from numba import njit, prange, get_num_threads, set_num_threads
+except ImportError:
+ # Numba is optional, without it the KS test is computed with NumPy only
+ njit = None
 
-# Define a Lognormal distribution with a median (geometric mean)
-# close to 84.7 Bq/m3 and for which ~17.8% of the distribution > 200 Bq/m3
-# This corresponds to a lognormal representation of the data
-# collected as part of the CCRS 2024 study:
-# reference: https://crosscanadaradon.ca/survey/
-# Quote: 'When all Canadian data (for all regions, communities, and building types) 
-#		  are combined in a manner that is balanced by distribution of these factors as 
-#		  established by the 2021 Canada Census, the geometric average household radon 
-#		  level was 84.7 Bq/m³, with just under 1 in 5 (17.8%) of single-detached, 
-#		  semi-detached, and row-type residential buildings containing radon levels 
-#		  that are at or over 200 Bq/m³.'
-
-########################
-### TEST MODEL BEGIN ###
-########################
-mu = 129.6
-sigma = 150.35
-
-a = 1 + (sigma / mu) ** 2
-s = np.sqrt(np.log(a))
-scale = mu / np.sqrt(a)
-
-distr = stats.lognorm(s, 0, scale)
-
-
-# generate some random values according to the model (1,000,000)
-randomvals = distr.rvs(1_000_000)
-# convert into a numpy array for ease-of-use
-rnp = np.array(randomvals)
-
-print("Target: 84.7 Bq/m3 with 17.8% above 200")
-tot_num = rnp.size
-percent_above_200 =  100.0*((rnp > 200.0).sum()/tot_num)
-# median (=Geometric mean for Lognormal distributions)
-gm_value = np.percentile(randomvals,50)
-
-print("Gemetric mean of distribution: "+str(gm_value)+", % above 200 Bq/m3: "+str(percent_above_200))
-######################
-### TEST MODEL END ###
-######################
-
-# Number of random sampling iterations
-# For each sample size, we will randomly sample =num_iterations times
-# 10,000 takes quite a while, recommend 100 for testing
-num_iterations = 10000
-
-sample_sizes = [5, 10, 25, 50, 100, 250, 500, 750, 1000, 2000, 10000, 100000]
-
-# KS values for 0.05 confidence taken from here:
-# https://real-statistics.com/statistics-tables/kolmogorov-smirnov-table/
-# Each of the elements in this array corresponds to the 0.05 critical value
-# for the equivalent element in the array above ('sample_sizes')
-ks_crit_d_05 = [0.56327, 0.40925, 0.26404, 0.18845, 0.13581, 0.085893786, 0.060736078, 0.0495908, 0.042946893, 0.030368039, 0.013581, 0.004294689]
-# Ignore below, for testing
-#sample_sizes = [1000000]
-
-# For each set of sampling, we'll store the 90% lower and upper confidence bounds
-# of the KS-test D-statistic
-sample_ksd_lower_bounds = []
-sample_ksd_upper_bounds = []
-sample_ksd_medians = []
-
-# ... and the p-Value
-sample_ksp_lower_bounds = []
-sample_ksp_upper_bounds = []
-sample_ksp_medians = []
-
-sample_arrs_ksd = []
-sample_arrs_ksp = []
-
-# ... and the fraction of samples > 200 Bq/m3
-fr_above_200 = []
-fr_above_200_lower_bounds = []
-fr_above_200_upper_bounds = []
-
-
-for s in (sample_sizes):
- print("----------------------------------------")
- 
- # For this sample size, store the observed geometric means
- cur_sample_ksd = []
- cur_sample_ksp = []
- cur_fr_above_200 = []
+try:
+ import cupy as cp
+ # An installed CuPy is not enough, it also needs a usable CUDA device and
+ # driver (getDeviceCount raises a CUDARuntimeError without them)
+ if cp.cuda.runtime.getDeviceCount() < 1:
+  cp = None
+except (ImportError, RuntimeError):
+ # CuPy is optional, without it everything runs on the CPU
+ cp = None
+
+
+# Size of the CPU L2 cache (per core). On the CPU the (iterations x sample size)
+# matrix of samples is built in tiles of iterations sized to fit in it, so that
+# each tile stays in cache while it is processed. Adjust to your machine.
+l2_cache_bytes = 2 * 1024**2
+
+# With Numba, the ranks of the sampled values in the parent population are
+# found by merging each sample with the parent population (rather than by
+# binary searches) once the sample size is above 1/ks_merge_min_ratio of the
+# parent population size, i.e. where streaming through the whole parent
+# population becomes cheaper than s random lookups into it
+ks_merge_min_ratio = 64
+
+# The merge streams through the whole parent population for every sample
+# whatever the tile size, so there the L2 tiles are not used: the batches are
+# instead sized by number of sampled values, large enough to give every Numba
+# thread rows to merge and to vectorize the p-values over many samples
+merge_max_batch_values = 10**7
+
+# Up to this sample and parent population size stats.kstest computes exact
+# p-Values (beyond it, the asymptotic distribution). Small parent populations,
+# e.g. the radon values of a small study, fall in the exact range.
+ks_exact_max_n = 10000
+
+# Sample sizes from which the resampling and the KS test are done on the GPU
+# (if CuPy is available): large samples are where the GPU memory bandwidth
+# pays off, and there the batches can be larger
+gpu_min_sample_size = 10000
+gpu_max_batch_values = 10**7
+
+
+def init_worker(population, population_sorted, num_threads):
+ # Give each worker process its own reference to the parent population
+ # (and to its sorted copy, used by the KS test)
+ global rnp, rnp_sorted
+ rnp = population
+ rnp_sorted = population_sorted
  
- print("Sample size: "+str(s)+", iterations: "+str(num_iterations))
+ # Share the cores between the worker processes, otherwise every worker
+ # starts one Numba thread per core for the parallel KS kernels
+ if njit is not None:
+  # (Numba refuses more threads than its pool, which NUMBA_NUM_THREADS may cap)
+  set_num_threads(min(num_threads, numba_config.NUMBA_NUM_THREADS))
+
+
+if njit is not None:
+ @njit(parallel=True, cache=True)
+ def ks_d_numba(samples_sorted, rnp_sorted):
+  # Numba version of the D-statistic computed in ks_test_sorted(). Each sample
+  # is handled by its own thread in a single pass, and since the sampled values
+  # are sorted, each search for their rank in the parent population starts
+  # from the rank of the previous value.
+  B, s = samples_sorted.shape
+  n2 = rnp_sorted.size
+  ksd = np.empty(B)
+  for b in prange(B):
+   d = 0.0
+   left = 0
+   right = 0
+   for i in range(s):
+    v = samples_sorted[b, i]
+    left = left + np.searchsorted(rnp_sorted[left:], v, side='left')
+    right = max(left, right)
+    right = right + np.searchsorted(rnp_sorted[right:], v, side='right')
+    d = max(d, (i+1)/s - right/n2, left/n2 - i/s)
+   ksd[b] = d
+  return ksd
  
- # For more information on the critical value,
- # see: https://blogs.sas.com/content/iml/2019/05/20/critical-values-kolmogorov-test.html
- crit_value = 1.36*pow((s+1e6)/(s*1e6),0.5)
- print("Critical value: "+str(crit_value))
+ @njit(parallel=True, cache=True)
+ def ks_d_numba_merge(samples_sorted, rnp_sorted):
+  # Same as ks_d_numba(), but the ranks of the sampled values are found by
+  # merging each sample with the parent population in one sequential pass,
+  # O(s + n2), instead of one binary search (random memory accesses) per value
+  B, s = samples_sorted.shape
+  n2 = rnp_sorted.size
+  ksd = np.empty(B)
+  for b in prange(B):
+   d = 0.0
+   left = 0
+   right = 0
+   for i in range(s):
+    v = samples_sorted[b, i]
+    while left < n2 and rnp_sorted[left] < v:
+     left += 1
+    right = max(left, right)
+    while right < n2 and rnp_sorted[right] <= v:
+     right += 1
+    d = max(d, (i+1)/s - right/n2, left/n2 - i/s)
+   ksd[b] = d
+  return ksd
+else:
+ ks_d_numba = None
+ ks_d_numba_merge = None
+
+
+def ks_use_merge(s, n2):
+ # Whether the KS test of samples of size s against a parent population of
+ # size n2 goes through the Numba merge kernel
+ return ks_d_numba_merge is not None and s*ks_merge_min_ratio > n2
 
- count_above_crit = 0	
- for i in range(0, num_iterations):
+
+def ks_test_sorted(samples_sorted, rnp_sorted):
+ # Two-sample KS test of each sample (each row of 'samples_sorted') against
+ # the parent population. Equivalent to stats.kstest(sampled_values, rnp) for
+ # every row, but takes the samples and the parent population already sorted
+ # so that the parent population is not sorted again for every sample.
+ # The D-statistic is always computed here, the p-Value only in the asymptotic
+ # case (see ks_pvalue), the exact p-Values are left to stats.kstest.
+ s = samples_sorted.shape[-1]
+ n2 = rnp_sorted.size
  
-  # Perform a sample
-  sampled_values = np.random.choice(rnp, size=s, replace=False)
-  
-  count_fr = 0
-  count_tot = 0
-  for z in sampled_values:
-  	count_tot = count_tot + 1
-  	if (z > 200):
-  		count_fr = count_fr + 1
-  
-  cur_fr_above_200.append(100.0*count_fr/count_tot)		
-  	
+ if ks_use_merge(s, n2):
+  ksd = ks_d_numba_merge(samples_sorted, rnp_sorted)
+ elif ks_d_numba is not None:
+  ksd = ks_d_numba(samples_sorted, rnp_sorted)
+ else:
+  # CDF of the sample just after (cdf1) and just before (cdf1 - 1/s) each
+  # sampled value, and the CDF of the parent population at the same values
+  cdf1 = np.arange(1, s+1)/s
+  cdf2_right = np.searchsorted(rnp_sorted, samples_sorted, side='right')/n2
+  cdf2_left = np.searchsorted(rnp_sorted, samples_sorted, side='left')/n2
   
-  # Compute the KS test
-  cur_ks_test = stats.kstest(sampled_values, rnp)
-  
-  # Obtain the D-statistic and pValue
-  cur_ksd = cur_ks_test.statistic
-  cur_ksp = cur_ks_test.pvalue
+  # D-statistic, i.e. the max distance between the two CDFs
+  ksd = np.maximum(np.max(cdf1 - cdf2_right, axis=-1), np.max(cdf2_left - (cdf1 - 1.0/s), axis=-1))
+ 
+ if max(s, n2) <= ks_exact_max_n:
+  # The exact p-Value only depends on the D-statistic (and s, n2), so
+  # stats.kstest is run once per distinct D-statistic rather than per row
+  ksd_unique, rows = np.unique(ksd, return_index=True)
+  ksp_unique = np.array([stats.kstest(samples_sorted[r], rnp_sorted).pvalue for r in rows])
+  return ksd, ksp_unique[np.searchsorted(ksd_unique, ksd)]
+ 
+ return ksd, ks_pvalue(ksd, s, n2)
+
+
+def ks_d_gpu(samples_sorted, rnp_sorted):
+ # CuPy version of the D-statistic computed in ks_test_sorted(), for samples
+ # and a sorted parent population already on the GPU. Only the D-statistics
+ # are copied back.
+ s = samples_sorted.shape[-1]
+ n2 = rnp_sorted.size
+ cdf1 = cp.arange(1, s+1)/s
+ cdf2_right = cp.searchsorted(rnp_sorted, samples_sorted, side='right')/n2
+ cdf2_left = cp.searchsorted(rnp_sorted, samples_sorted, side='left')/n2
+ ksd = cp.maximum(cp.max(cdf1 - cdf2_right, axis=-1), cp.max(cdf2_left - (cdf1 - 1.0/s), axis=-1))
+ return cp.asnumpy(ksd)
+
+
+def ks_pvalue(ksd, s, n2):
+ # Asymptotic p-Value of the D-statistic(s) 'ksd' for a sample of size 's',
+ # as computed by stats.kstest when the sample or the parent population (of
+ # size 'n2') is larger than ks_exact_max_n
+ en = s*n2/(s+n2)
+ return np.clip(stats.kstwo.sf(ksd, np.round(en)), 0.0, 1.0)
+
+
+def run_one(s, num_iterations, seed):
+ # Randomly sample 'num_iterations' times a sample of size 's' and return
+ # the KS-test D-statistics, p-Values and % above 200 Bq/m3 of each sample.
+ # Each sample size gets its own seed so that the worker processes draw
+ # statistically independent random streams.
+ rng = np.random.default_rng(seed)
+ 
+ # For this sample size, store the observed KS-test statistics
+ cur_sample_ksd = np.empty(num_iterations)
+ cur_sample_ksp = np.empty(num_iterations)
+ cur_fr_above_200 = np.empty(num_iterations)
+ 
+ # (the exact p-Values need the samples on the CPU for stats.kstest)
+ use_gpu = cp is not None and s >= gpu_min_sample_size and max(s, rnp.size) > ks_exact_max_n
+ if use_gpu:
+  # Keep the parent population and the random numbers on the GPU
+  rnp_gpu = cp.asarray(rnp)
+  rnp_sorted_gpu = cp.asarray(rnp_sorted)
+  rng_gpu = cp.random.RandomState(int(seed.generate_state(1)[0]))
+  batch = max(1, gpu_max_batch_values // s)
+ else:
+  if ks_use_merge(s, rnp_sorted.size):
+   batch = max(get_num_threads(), merge_max_batch_values // s)
+  else:
+   batch = max(1, l2_cache_bytes // (s*rnp.itemsize))
   
-  # Store it in the current array for this sample size
-  cur_sample_ksd.append(cur_ksd) 
-  cur_sample_ksp.append(cur_ksp) 	
+  # The samples of every batch are gathered into the same buffer
+  sample_buf = np.empty((min(batch, num_iterations), s), dtype=rnp.dtype)
+ 
+ # The sampled indices are drawn as int32 rather than the default int64, which
+ # halves the size of the largest intermediate array (the population is far
+ # smaller than 2^31 values)
+ for b0 in range(0, num_iterations, batch):
+  b1 = min(b0 + batch, num_iterations)
   
-  # Output some progress
-  if ( (i % 10) == 0):
-   print("--"+str(100.0*i/num_iterations)+ "% complete")
+  if use_gpu:
+   # Perform (b1 - b0) samples at once on the GPU, one per row, and compute
+   # the % above 200 Bq/m3 and the KS test of every sample
+   samples = rnp_gpu[rng_gpu.randint(0, rnp.size, size=(b1 - b0, s), dtype=cp.int32)]
+   cur_fr_above_200[b0:b1] = cp.asnumpy(100.0*cp.count_nonzero(samples > 200, axis=1)/s)
+   samples.sort(axis=1)
+   cur_sample_ksd[b0:b1] = ks_d_gpu(samples, rnp_sorted_gpu)
+   cur_sample_ksp[b0:b1] = ks_pvalue(cur_sample_ksd[b0:b1], s, rnp_sorted.size)
+  else:
+   # Perform (b1 - b0) samples at once, one per row
+   idx = rng.integers(0, rnp.size, size=(b1 - b0, s), dtype=np.int32)
+   samples = np.take(rnp, idx, out=sample_buf[:b1 - b0], mode='clip')
+   
+   # Compute the % above 200 Bq/m3 of each sample
+   cur_fr_above_200[b0:b1] = 100.0*np.count_nonzero(samples > 200, axis=1)/s
+   
+   # Compute the KS test of every sample, obtaining the D-statistic and pValue
+   samples.sort(axis=1)
+   cur_sample_ksd[b0:b1], cur_sample_ksp[b0:b1] = ks_test_sorted(samples, rnp_sorted)
  
- # Compute the 5th percentile and 95th percentile (spread = 90% CI)
+ return cur_sample_ksd, cur_sample_ksp, cur_fr_above_200
+
+
+if __name__ == "__main__":
+ # Define a Lognormal distribution with a median (geometric mean)
+ # close to 84.7 Bq/m3 and for which ~17.8% of the distribution > 200 Bq/m3
+ # This corresponds to a lognormal representation of the data
+ # collected as part of the CCRS 2024 study:
+ # reference: https://crosscanadaradon.ca/survey/
+ # Quote: 'When all Canadian data (for all regions, communities, and building types) 
+ #		  are combined in a manner that is balanced by distribution of these factors as 
+ #		  established by the 2021 Canada Census, the geometric average household radon 
+ #		  level was 84.7 Bq/m³, with just under 1 in 5 (17.8%) of single-detached, 
+ #		  semi-detached, and row-type residential buildings containing radon levels 
+ #		  that are at or over 200 Bq/m³.'
+
+ ########################
+ ### TEST MODEL BEGIN ###
+ ########################
+ mu = 129.6
+ sigma = 150.35
+
+ a = 1 + (sigma / mu) ** 2
+ s = np.sqrt(np.log(a))
+ scale = mu / np.sqrt(a)
+
+ # generate some random values according to the model (1,000,000),
+ # i.e. a lognormal with a median of 'scale' and a shape (sigma of the log) of 's'
+ rng = np.random.default_rng()
+ rnp = rng.lognormal(mean=np.log(scale), sigma=s, size=1_000_000)
+
+ print("Target: 84.7 Bq/m3 with 17.8% above 200")
+ tot_num = rnp.size
+ percent_above_200 =  100.0*((rnp > 200.0).sum()/tot_num)
+ # median (=Geometric mean for Lognormal distributions)
+ gm_value = np.percentile(rnp,50)
+
+ print("Gemetric mean of distribution: "+str(gm_value)+", % above 200 Bq/m3: "+str(percent_above_200))
+ ######################
+ ### TEST MODEL END ###
+ ######################
+
+ # Radon levels are only measured to ~3 significant digits, so single precision
+ # is plenty and halves the memory traffic of the resampling below
+ rnp = rnp.astype(np.float32)
+
+ # Number of random sampling iterations
+ # For each sample size, we will randomly sample =num_iterations times
+ # 10,000 takes quite a while, recommend 100 for testing
+ num_iterations = 10000
+
+ sample_sizes = [5, 10, 25, 50, 100, 250, 500, 750, 1000, 2000, 10000, 100000]
+
+ # KS values for 0.05 confidence taken from here:
+ # https://real-statistics.com/statistics-tables/kolmogorov-smirnov-table/
+ # Each of the elements in this array corresponds to the 0.05 critical value
+ # for the equivalent element in the array above ('sample_sizes')
+ ks_crit_d_05 = np.array([0.56327, 0.40925, 0.26404, 0.18845, 0.13581, 0.085893786, 0.060736078, 0.0495908, 0.042946893, 0.030368039, 0.013581, 0.004294689])
+ # Ignore below, for testing
+ #sample_sizes = [1000000]
+
+ # For each sample size (row), we'll store the KS-test D-statistic and p-Value
+ # of every sample (column)
+ sample_arrs_ksd = np.empty((len(sample_sizes), num_iterations))
+ sample_arrs_ksp = np.empty((len(sample_sizes), num_iterations))
+ # ... and the fraction of samples > 200 Bq/m3
+ sample_arrs_fr = np.empty((len(sample_sizes), num_iterations))
+
+ # Sort the parent population once, it is the reference of every KS test
+ # (and is reused for the histogram of Figure 1)
+ rnp_sorted = np.sort(rnp)
+
+ # Each sample size is independent, so spread them over the available cores
+ seeds = np.random.SeedSequence().spawn(len(sample_sizes))
+ # (only the cores this process may run on, which under taskset, cgroups or
+ # Slurm can be fewer than os.cpu_count())
+ if hasattr(os, "sched_getaffinity"):
+  num_cpus = len(os.sched_getaffinity(0))
+ else:
+  num_cpus = os.cpu_count() or 1
+ num_processes = max(1, min(len(sample_sizes), num_cpus - 1))
+ num_threads = max(1, num_cpus // num_processes)
+ with Pool(num_processes, initializer=init_worker, initargs=(rnp, rnp_sorted, num_threads)) as pool:
+  jobs = [pool.apply_async(run_one, (s, num_iterations, seed)) for s, seed in zip(sample_sizes, seeds)]
+  
+  # The workers do not print anything, output some progress as each sample size completes
+  for s_index, job in enumerate(jobs):
+   sample_arrs_ksd[s_index], sample_arrs_ksp[s_index], sample_arrs_fr[s_index] = job.get()
+   print("Sample size: "+str(sample_sizes[s_index])+", iterations: "+str(num_iterations)+" -- complete")
+
+ # For each set of sampling, compute the 5th percentile, median and 95th
+ # percentile (spread = 90% CI) of every sample size at once
  # KS-test D-Statistic
- sample_ksd_lower_bounds.append(np.percentile(np.array(cur_sample_ksd),5))
- sample_ksd_upper_bounds.append(np.percentile(np.array(cur_sample_ksd),95))
- sample_ksd_medians.append(np.percentile(np.array(cur_sample_ksd),50))
+ sample_ksd_lower_bounds, sample_ksd_medians, sample_ksd_upper_bounds = np.percentile(sample_arrs_ksd, [5, 50, 95], axis=1)
  
  #KS-test p-Value
- sample_ksp_lower_bounds.append(np.percentile(np.array(cur_sample_ksp),5))
- sample_ksp_upper_bounds.append(np.percentile(np.array(cur_sample_ksp),95))
- sample_ksp_medians.append(np.percentile(np.array(cur_sample_ksp),50))
- 
- sample_arrs_ksd.append(cur_sample_ksd)
- sample_arrs_ksp.append(cur_sample_ksp)
- 
- fr_above_200.append(np.percentile(np.array(cur_fr_above_200),50))
- fr_above_200_lower_bounds.append(np.percentile(np.array(cur_fr_above_200),5))
- fr_above_200_upper_bounds.append(np.percentile(np.array(cur_fr_above_200),95))
-   
- #Output some progress on the confidence intervals being computed
- print("Current lower bounds KS D-Statistic: "+str(sample_ksd_lower_bounds))
- print("Current upper bounds KS D-Statistic: "+str(sample_ksd_upper_bounds))
+ sample_ksp_lower_bounds, sample_ksp_medians, sample_ksp_upper_bounds = np.percentile(sample_arrs_ksp, [5, 50, 95], axis=1)
  
- print("Current lower bounds KS p-Value: "+str(sample_ksp_lower_bounds))
- print("Current upper bounds KS p-Value: "+str(sample_ksp_upper_bounds))
+ # % above 200 Bq/m3
+ fr_above_200_lower_bounds, fr_above_200, fr_above_200_upper_bounds = np.percentile(sample_arrs_fr, [5, 50, 95], axis=1)
  
-### Figure 1, the parent distribution (sanity check)
-plt.figure(1)
-plt.hist(rnp, bins='auto')  # arguments are passed to np.histogram
-plt.xlabel("Radon level (Bq/m3)")
-plt.ylabel("Counts")
-plt.title('')
-plt.grid()
-#plt.yscale("log")
-plt.xlim(0, 1000)
-plt.ylim(0, 20000)
-
-###################################
-### Figure 2, confidence intervals - KS test D-Statistic
-plt.figure(2)
-plt.plot(sample_sizes, sample_ksd_medians, '-r', linewidth=2.0, label='Average (median)')
-plt.plot(sample_sizes, sample_ksd_lower_bounds, '--b', linewidth=2.0, label='90% C.I.')
-plt.plot(sample_sizes, sample_ksd_upper_bounds, '--b', linewidth=2.0)
-plt.plot(sample_sizes, ks_crit_d_05, color='black', linestyle='solid', linewidth=2.0, label='KS test critical value (0.05)')
-
-legend = plt.legend(loc='upper right')
-
-plt.xlabel("Sampling number (# radon tests per region)")
-plt.ylabel("90% Confidence interval of KS-test D-statistic distribution")
-plt.title('')
-plt.grid()
-plt.xscale("log")
-#plt.xlim(1, 200000)
-#plt.ylim(0, 220)
-
-### Figure 3, confidence intervals - KS test p-Value
-###################################
-plt.figure(3)
-plt.plot(sample_sizes, sample_ksp_lower_bounds, '--bo', linewidth=2.0)
-plt.plot(sample_sizes, sample_ksp_upper_bounds, '--bo', linewidth=2.0)
-plt.plot(sample_sizes, sample_ksp_medians, '--ro', linewidth=2.0)
-
-plt.xlabel("Sampling number (# radon tests per region)")
-plt.ylabel("90% Confidence interval of KS-test p-Value distribution")
-plt.title('')
-plt.grid()
-plt.xscale("log")
-#plt.xlim(1, 200000)
-#plt.ylim(0, 220)
-
-### Figure 4, confidence intervals - KS test p-Value
-###################################
-plt.figure(4)
-plt.plot(sample_sizes, fr_above_200_lower_bounds, '--bo', linewidth=2.0)
-plt.plot(sample_sizes, fr_above_200_upper_bounds, '--bo', linewidth=2.0)
-plt.plot(sample_sizes, fr_above_200, '--ro', linewidth=2.0)
-
-plt.xlabel("Sampling number (# radon tests per region)")
-plt.ylabel("90% Confidence interval of % above 200 Bq/m3")
-plt.title('')
-plt.grid()
-plt.xscale("log")
-#plt.xlim(1, 200000)
-#plt.ylim(0, 220)
-
-plot_number = 5
-
-for i in range(0,len(sample_sizes)):
- ### D-STATISTIC
- ###################################
- plt.figure(plot_number)
- plt.hist(sample_arrs_ksd[i], bins='auto')  # arguments are passed to np.histogram
- plt.xlabel("KS-test D-statistic (sample size: "+ str(sample_sizes[i])+")")
+ # % of samples for which the KS test rejects the parent distribution at 0.05,
+ # i.e. with a D-statistic above the critical value
+ sample_pc_above_crit = 100.0*np.count_nonzero(sample_arrs_ksd > ks_crit_d_05[:, np.newaxis], axis=1)/num_iterations
+
+ #Output the confidence intervals computed
+ print("----------------------------------------")
+ print("Lower bounds KS D-Statistic: "+str(sample_ksd_lower_bounds))
+ print("Upper bounds KS D-Statistic: "+str(sample_ksd_upper_bounds))
+
+ print("Lower bounds KS p-Value: "+str(sample_ksp_lower_bounds))
+ print("Upper bounds KS p-Value: "+str(sample_ksp_upper_bounds))
+
+ print("% above KS-test critical value (0.05): "+str(sample_pc_above_crit))
+
+ ### Figure 1, the parent distribution (sanity check)
+ plt.figure(1)
+ # Fixed bins over the plotted range, rather than bins='auto' which has to
+ # work out the bin width from the whole population first
+ counts, edges = np.histogram(rnp_sorted, bins=256, range=(0, 1000))
+ plt.stairs(counts, edges, fill=True)
+ plt.xlabel("Radon level (Bq/m3)")
  plt.ylabel("Counts")
  plt.title('')
  plt.grid()
+ #plt.yscale("log")
+ plt.xlim(0, 1000)
+ plt.ylim(0, 1.05*counts.max())
+
+ ###################################
+ ### Figure 2, confidence intervals - KS test D-Statistic
+ plt.figure(2)
+ plt.plot(sample_sizes, sample_ksd_medians, '-r', linewidth=2.0, label='Average (median)')
+ plt.plot(sample_sizes, sample_ksd_lower_bounds, '--b', linewidth=2.0, label='90% C.I.')
+ plt.plot(sample_sizes, sample_ksd_upper_bounds, '--b', linewidth=2.0)
+ plt.plot(sample_sizes, ks_crit_d_05, color='black', linestyle='solid', linewidth=2.0, label='KS test critical value (0.05)')
+
+ legend = plt.legend(loc='upper right')
+
+ plt.xlabel("Sampling number (# radon tests per region)")
+ plt.ylabel("90% Confidence interval of KS-test D-statistic distribution")
+ plt.title('')
+ plt.grid()
  plt.xscale("log")
- plt.xlim(1e-4, 1.05)
- #plt.ylim(0, 20000)
- plot_number = plot_number+1
- 
- ### P-VALUE
+ #plt.xlim(1, 200000)
+ #plt.ylim(0, 220)
+
+ ### Figure 3, confidence intervals - KS test p-Value
  ###################################
- plt.figure(plot_number)
- plt.hist(sample_arrs_ksp[i], bins='auto')  # arguments are passed to np.histogram
- plt.xlabel("KS-test p-Value (sample size: "+ str(sample_sizes[i])+")")
- plt.ylabel("Counts")
+ plt.figure(3)
+ plt.plot(sample_sizes, sample_ksp_lower_bounds, '--bo', linewidth=2.0)
+ plt.plot(sample_sizes, sample_ksp_upper_bounds, '--bo', linewidth=2.0)
+ plt.plot(sample_sizes, sample_ksp_medians, '--ro', linewidth=2.0)
+
+ plt.xlabel("Sampling number (# radon tests per region)")
+ plt.ylabel("90% Confidence interval of KS-test p-Value distribution")
  plt.title('')
  plt.grid()
- #plt.yscale("log")
- plt.xlim(0, 1.05)
- #plt.ylim(0, 20000)
- plot_number = plot_number+1
+ plt.xscale("log")
+ #plt.xlim(1, 200000)
+ #plt.ylim(0, 220)
+
+ ### Figure 4, confidence intervals - KS test p-Value
+ ###################################
+ plt.figure(4)
+ plt.plot(sample_sizes, fr_above_200_lower_bounds, '--bo', linewidth=2.0)
+ plt.plot(sample_sizes, fr_above_200_upper_bounds, '--bo', linewidth=2.0)
+ plt.plot(sample_sizes, fr_above_200, '--ro', linewidth=2.0)
+
+ plt.xlabel("Sampling number (# radon tests per region)")
+ plt.ylabel("90% Confidence interval of % above 200 Bq/m3")
+ plt.title('')
+ plt.grid()
+ plt.xscale("log")
+ #plt.xlim(1, 200000)
+ #plt.ylim(0, 220)
+
+ plot_number = 5
+
+ for i in range(0,len(sample_sizes)):
+  ### D-STATISTIC
+  ###################################
+  plt.figure(plot_number)
+  # Fixed number of bins, log-spaced over the D-statistic range to match the x
+  # axis (that range is empty if all the D statistics are equal, e.g. with a
+  # single iteration, then plain linear bins are used)
+  ksd_min, ksd_max = sample_arrs_ksd[i].min(), sample_arrs_ksd[i].max()
+  ksd_bins = np.geomspace(ksd_min, ksd_max, 129) if ksd_min < ksd_max else 128
+  plt.hist(sample_arrs_ksd[i], bins=ksd_bins)  # arguments are passed to np.histogram
+  plt.xlabel("KS-test D-statistic (sample size: "+ str(sample_sizes[i])+")")
+  plt.ylabel("Counts")
+  plt.title('')
+  plt.grid()
+  plt.xscale("log")
+  plt.xlim(1e-4, 1.05)
+  #plt.ylim(0, 20000)
+  plot_number = plot_number+1
+ 
+  ### P-VALUE
+  ###################################
+  plt.figure(plot_number)
+  plt.hist(sample_arrs_ksp[i], bins=128, range=(0, 1))  # arguments are passed to np.histogram
+  plt.xlabel("KS-test p-Value (sample size: "+ str(sample_sizes[i])+")")
+  plt.ylabel("Counts")
+  plt.title('')
+  plt.grid()
+  #plt.yscale("log")
+  plt.xlim(0, 1.05)
+  #plt.ylim(0, 20000)
+  plot_number = plot_number+1
 
-plt.show()
\ No newline at end of file
+ plt.show()
\ No newline at end of file